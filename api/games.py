@@ -1,34 +1,38 @@
 import random
 import string
 from fastapi import APIRouter, HTTPException, Depends
-from supabase import Client
+from postgrest import APIError
+from supabase import AsyncClient
 from typing import List, Dict
 
 from models import GameSettings, GameStateResponse, PlayerAction, GameCreationResponse, JoinResponse, ValidActionsResponse
 from database import get_db
-from game_logic import create_deck, shuffle_deck, get_player_positions
+from game_logic import CARD_STRS, create_deck, shuffle_deck, get_player_positions
 
 router = APIRouter()
 
 # --- Helper Functions ---
 
 def generate_game_code(length: int = 6) -> str:
-    """Generates a unique 6-digit alphanumeric game code."""
-    # For now, it's a simple random generator. In a production environment,
-    # you'd want to ensure this code is unique in the database.
+    """Generates a random 6-digit alphanumeric game code."""
+    # Uniqueness is enforced by the UNIQUE constraint on games.game_code;
+    # create_game retries with a fresh code if this one collides.
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
 
 
-def start_new_hand(game_id: str, players: List[Dict], settings: Dict, db: Client):
+async def start_new_hand(game_id: str, players: List[Dict], settings: Dict, db: AsyncClient):
     """
     Initializes a new hand by shuffling, dealing, and posting blinds.
     """
     # 1. Shuffle deck and deal cards
     deck = shuffle_deck(create_deck())
+    seat_ids = []
+    cards_arr = []
     for player in players:
-        # Deal two cards from the top of the deck
-        cards_to_deal = [deck.pop(), deck.pop()]
-        db.table("seats").update({"cards": cards_to_deal}).eq("id", player['id']).execute()
+        # Deal two cards from the top of the deck; the deck holds 0-51 ints,
+        # so convert to card strings only here at the DB boundary.
+        seat_ids.append(player['id'])
+        cards_arr.append([CARD_STRS[deck.pop()], CARD_STRS[deck.pop()]])
 
     # 2. Determine dealer position (for now, random on first hand)
     # A more robust solution would track the dealer button in the 'game_state' table
@@ -42,25 +46,16 @@ def start_new_hand(game_id: str, players: List[Dict], settings: Dict, db: Client
     small_blind_amount = settings['small_blind']
     big_blind_amount = settings['big_blind']
 
-    # In a production app, this would be a single, atomic database transaction or RPC.
-    # Here, we update each player and the pot sequentially.
-    
-    # Update small blind player
-    sb_player = next((p for p in players if p['seat_number'] == sb_seat), None)
-    db.table("seats").update({"chip_count": sb_player['chip_count'] - small_blind_amount}).eq("id", sb_player['id']).execute()
-    
-    # Update big blind player
-    bb_player = next((p for p in players if p['seat_number'] == bb_seat), None)
-    db.table("seats").update({"chip_count": bb_player['chip_count'] - big_blind_amount}).eq("id", bb_player['id']).execute()
+    # One seat -> player lookup table instead of three linear scans. A bad
+    # seat from get_player_positions would be a logic bug, so let the
+    # KeyError surface loudly rather than masking it with a None check.
+    by_seat = {p['seat_number']: p for p in players}
+    sb_player = by_seat[sb_seat]
+    bb_player = by_seat[bb_seat]
+    utg_player = by_seat[utg_seat]
 
-    # 5. Update the main game_state
+    # 5. Build the new shared game state
     pot_size = small_blind_amount + big_blind_amount
-    
-    # Find the user_id for the player who is UTG (Under the Gun)
-    utg_player = next((p for p in players if p['seat_number'] == utg_seat), None)
-    if not utg_player:
-        # This should ideally never happen with 2+ players
-        raise Exception("Could not determine the first player to act.")
 
     game_state_update = {
         "dealer_position": dealer_seat,
@@ -69,13 +64,25 @@ def start_new_hand(game_id: str, players: List[Dict], settings: Dict, db: Client
         "community_cards": [],
         "current_player_turn": utg_player['user_id']
     }
-    db.table("game_state").update(game_state_update).eq("game_id", game_id).execute()
+
+    # 6. Apply everything in a single atomic RPC instead of N+2 sequential
+    # updates (one per dealt hand, one per blind, one for game_state).
+    await db.rpc("deal_and_post_blinds", {
+        "p_game_id": game_id,
+        "p_seat_ids": seat_ids,
+        "p_cards_arr": cards_arr,
+        "p_sb_id": sb_player['id'],
+        "p_sb_amt": small_blind_amount,
+        "p_bb_id": bb_player['id'],
+        "p_bb_amt": big_blind_amount,
+        "p_game_state": game_state_update,
+    }).execute()
 
 
 # --- API Endpoints ---
 
 @router.post("/games/create", status_code=201, response_model=GameCreationResponse)
-def create_game(settings: GameSettings, db: Client = Depends(get_db)):
+async def create_game(settings: GameSettings, db: AsyncClient = Depends(get_db)):
     """
     Creates a new poker game and sets the creator as the host.
     """
@@ -91,43 +98,51 @@ def create_game(settings: GameSettings, db: Client = Depends(get_db)):
     game_code = generate_game_code()
 
     try:
-        # --- Database Transaction ---
-        # 1. Insert into 'games' table
-        game_data = {
-            "game_code": game_code,
-            "host_id": host_id,
-            "settings": settings.dict()
-        }
-        game_res = db.table("games").insert(game_data).execute()
-        game_id = game_res.data[0]['id']
-
-        # 2. Insert into 'game_state' table
-        db.table("game_state").insert({"game_id": game_id}).execute()
-
-        # 3. Insert host into 'seats' table
-        host_seat_data = {
-            "game_id": game_id,
-            "user_id": host_id,
-            "seat_number": 1, # Host always starts at seat 1
-            "chip_count": settings.buy_in,
-            "status": "playing"
-        }
-        db.table("seats").insert(host_seat_data).execute()
+        # The create_game_with_host function inserts the games row, its
+        # game_state row and the host's seat in one atomic call instead of
+        # three sequential inserts. games.game_code is UNIQUE, so rather than
+        # a pre-check SELECT we insert optimistically and retry with a fresh
+        # code on the rare collision (unique_violation, SQLSTATE 23505).
+        game_id = None
+        for _ in range(5):
+            try:
+                res = await db.rpc("create_game_with_host", {
+                    "p_game_code": game_code,
+                    "p_host_id": host_id,
+                    "p_settings": settings.model_dump(),
+                }).execute()
+                game_id = res.data
+                break
+            except APIError as e:
+                if e.code != "23505":
+                    raise
+                game_code = generate_game_code()
+        if game_id is None:
+            raise HTTPException(status_code=500, detail="Could not generate a unique game code.")
 
         # If use_real_chips was true, you would update the host's profile.bank_balance here.
 
         return {"game_id": game_id, "game_code": game_code}
 
+    except HTTPException as he:
+        raise he # Re-raise known HTTP exceptions
     except Exception as e:
-        # If any part of the transaction fails, you might want to roll back the changes.
-        # Supabase doesn't have built-in transactions in the Python client,
-        # so this would be handled with PostgreSQL functions (RPC).
         print(f"Error creating game: {e}")
         raise HTTPException(status_code=500, detail="Could not create game.")
 
 
+# SQLSTATEs raised by the claim_seat function, mapped to the HTTP errors the
+# old Python-side checks used to produce.
+_CLAIM_SEAT_ERRORS = {
+    "PGNF0": (404, "Game not found."),
+    "PGIP0": (403, "Game is already in progress."),
+    "PGDU0": (400, "You are already in this game."),
+    "PGFU0": (403, "Game is full."),
+}
+
+
 @router.post("/games/{game_code}/join", status_code=200, response_model=JoinResponse)
-def join_game(game_code: str, db: Client = Depends(get_db)):
+async def join_game(game_code: str, db: AsyncClient = Depends(get_db)):
     """
     Allows a player to join an existing game. The server will assign the first
     available seat.
@@ -135,90 +150,84 @@ def join_game(game_code: str, db: Client = Depends(get_db)):
     player_id = "f0e9d8c7-b6a5-4321-fedc-ba9876543210" # Placeholder user ID
 
     try:
-        # Fetch the game by its code
-        game_res = db.table("games").select("id, status, settings").eq("game_code", game_code).single().execute()
-        if not game_res.data:
-            raise HTTPException(status_code=404, detail="Game not found.")
-
-        game = game_res.data
-        game_id = game['id']
-        max_players = game['settings']['max_players']
-
-        if game['status'] != 'waiting':
-            raise HTTPException(status_code=403, detail="Game is already in progress.")
-
-        # --- Find first available seat ---
-        seats_res = db.table("seats").select("user_id, seat_number").eq("game_id", game_id).execute()
-        
-        if len(seats_res.data) >= max_players:
-            raise HTTPException(status_code=403, detail="Game is full.")
-
-        # Check if player is already in the game
-        if any(seat['user_id'] == player_id for seat in seats_res.data):
-             raise HTTPException(status_code=400, detail="You are already in this game.")
-
-        taken_seats = {seat['seat_number'] for seat in seats_res.data}
-        
-        available_seat = -1
-        # Iterate from seat 1 up to the max number of players to find an open spot.
-        for seat_num in range(1, max_players + 1):
-            if seat_num not in taken_seats:
-                available_seat = seat_num
-                break
-        
-        if available_seat == -1:
-            # This case should be rare if the 'game is full' check works, but it's a good safeguard.
-            raise HTTPException(status_code=500, detail="Could not find an available seat, the game might be full.")
-
-        # Add player to the 'seats' table
-        player_seat_data = {
-            "game_id": game_id,
-            "user_id": player_id,
-            "seat_number": available_seat,
-            "chip_count": game['settings']['buy_in'],
-            "status": "playing"
-        }
-        db.table("seats").insert(player_seat_data).execute()
-
-        return {"seat_number": available_seat}
-
-    except HTTPException as he:
-        raise he # Re-raise known HTTP exceptions
+        # The claim_seat function validates the game, picks the lowest open
+        # seat and inserts the player in one atomic call, so there's no race
+        # between two players joining at the same time.
+        res = await db.rpc("claim_seat", {"p_game_code": game_code, "p_user_id": player_id}).execute()
+        return {"seat_number": res.data}
+
+    except APIError as e:
+        known = _CLAIM_SEAT_ERRORS.get(e.code)
+        if known:
+            raise HTTPException(status_code=known[0], detail=known[1])
+        print(f"Error joining game: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while trying to join the game.")
     except Exception as e:
         print(f"Error joining game: {e}")
         raise HTTPException(status_code=500, detail="An error occurred while trying to join the game.")
 
 
+# Immutable-after-creation game metadata (id, host, blind sizes) keyed by
+# game_code. These fields never change once a game exists, so repeat lookups
+# can skip refetching them and only the mutable status hits the database.
+# Entries are dropped once the game starts, since nothing reads them after.
+_game_meta_cache: Dict[str, Dict] = {}
+
+
 @router.post("/games/{game_code}/start", status_code=200)
-def start_game(game_code: str, db: Client = Depends(get_db)):
+async def start_game(game_code: str, db: AsyncClient = Depends(get_db)):
     """
     Starts the game. Can only be initiated by the host.
     """
     host_id = "a1b2c3d4-e5f6-7890-1234-567890abcdef" # Placeholder host ID
 
     try:
-        # 1. Fetch game and validate requester is the host
-        game_res = db.table("games").select("id, host_id, status, settings").eq("game_code", game_code).single().execute()
-        if not game_res.data:
-            raise HTTPException(status_code=404, detail="Game not found.")
-        
-        game = game_res.data
+        # 1. Fetch game and validate requester is the host. The immutable
+        # fields come from the in-process cache after the first lookup; only
+        # the mutable status is refetched. Either way it's one narrow query.
+        game = _game_meta_cache.get(game_code)
+        if game is None:
+            game_res = await db.table("games").select(
+                "id, host_id, status, settings->small_blind, settings->big_blind"
+            ).eq("game_code", game_code).single().execute()
+            if not game_res.data:
+                raise HTTPException(status_code=404, detail="Game not found.")
+            game = game_res.data
+            status = game.pop('status')
+            _game_meta_cache[game_code] = game
+        else:
+            status_res = await db.table("games").select("status").eq(
+                "id", game['id']
+            ).single().execute()
+            status = status_res.data['status']
+
         if game['host_id'] != host_id:
             raise HTTPException(status_code=403, detail="Only the host can start the game.")
-        if game['status'] != 'waiting':
+        if status != 'waiting':
             raise HTTPException(status_code=400, detail="Game has already started or is finished.")
 
         # 2. Fetch players and validate there are enough to start
-        seats_res = db.table("seats").select("id, user_id, seat_number, status, chip_count").eq("game_id", game['id']).execute()
+        # Ordered by the (game_id, seat_number) index so turn-order logic
+        # never has to re-sort in Python.
+        seats_res = await db.table("seats").select(
+            "id, user_id, seat_number, status, chip_count"
+        ).eq("game_id", game['id']).order("seat_number").execute()
         players = seats_res.data
         if len(players) < 2:
             raise HTTPException(status_code=400, detail="Cannot start a game with fewer than 2 players.")
 
-        # 3. Update game status to 'in_progress'
-        db.table("games").update({"status": "in_progress"}).eq("id", game['id']).execute()
+        # 3. Update game status to 'in_progress'. Nothing reads the response,
+        # so ask PostgREST not to echo the updated row back.
+        await db.table("games").update(
+            {"status": "in_progress"}, returning="minimal"
+        ).eq("id", game['id']).execute()
 
         # 4. Start the first hand of the game
-        start_new_hand(game['id'], players, game['settings'], db)
+        blinds = {"small_blind": game['small_blind'], "big_blind": game['big_blind']}
+        await start_new_hand(game['id'], players, blinds, db)
+
+        # The game is underway; nothing joins or starts it again.
+        _game_meta_cache.pop(game_code, None)
 
         return {"detail": "Game started successfully."}
 
@@ -230,7 +239,7 @@ def start_game(game_code: str, db: Client = Depends(get_db)):
 
 
 @router.get("/games/{game_code}", response_model=GameStateResponse)
-def get_game_state(game_code: str, db: Client = Depends(get_db)):
+async def get_game_state(game_code: str, db: AsyncClient = Depends(get_db)):
     """
     Fetches the complete current state of a game for a player in the game.
     """
@@ -244,14 +253,43 @@ def get_game_state(game_code: str, db: Client = Depends(get_db)):
     raise HTTPException(status_code=501, detail="Endpoint not fully implemented.")
 
 
+# SQLSTATEs raised by the apply_action function, mapped to HTTP errors.
+_APPLY_ACTION_ERRORS = {
+    "PGNF0": (404, "Game not found."),
+    "PGNT0": (403, "It is not your turn."),
+    "PGNA0": (403, "You cannot act in this hand."),
+    "PGIL0": (400, "That action is not legal right now."),
+}
+
+
 @router.post("/games/{game_code}/action")
-def perform_action(game_code: str, action: PlayerAction, db: Client = Depends(get_db)):
+async def perform_action(game_code: str, action: PlayerAction, db: AsyncClient = Depends(get_db)):
     """
     A player submits a game action (e.g., fold, check, bet).
     """
-    # Validate it's the player's turn
-    # Validate the action is legal
-    # Update database tables (seats, game_state)
-    # Determine if the betting round is over and proceed
-    
-    raise HTTPException(status_code=501, detail="Endpoint not fully implemented.")
+    player_id = "f0e9d8c7-b6a5-4321-fedc-ba9876543210" # Placeholder user ID
+
+    try:
+        # The apply_action function locks the game state, validates the turn
+        # and the action's legality, moves the chips and advances the turn in
+        # one transaction — a single round trip for the highest-traffic
+        # endpoint, with no window for two actions to interleave.
+        # (Detecting the end of the betting round and dealing the next street
+        # will build on this once community-card logic lands.)
+        res = await db.rpc("apply_action", {
+            "p_game_code": game_code,
+            "p_user_id": player_id,
+            "p_action": action.action,
+            "p_amount": action.amount,
+        }).execute()
+        return res.data
+
+    except APIError as e:
+        known = _APPLY_ACTION_ERRORS.get(e.code)
+        if known:
+            raise HTTPException(status_code=known[0], detail=known[1])
+        print(f"Error performing action: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while performing the action.")
+    except Exception as e:
+        print(f"Error performing action: {e}")
+        raise HTTPException(status_code=500, detail="An error occurred while performing the action.")
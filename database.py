@@ -0,0 +1,45 @@
+import os
+from typing import Optional
+
+import httpx
+from supabase import acreate_client, AsyncClient
+from supabase.lib.client_options import AsyncClientOptions
+
+# Process-wide async Supabase client. Building a client per request costs a
+# fresh TCP/TLS handshake on every call and eventually exhausts connections
+# under load, so we construct one client lazily and share its underlying
+# HTTP connection pool across every request handled by this worker. Being
+# async, DB round trips yield the event loop instead of tying up a
+# threadpool worker.
+_db: Optional[AsyncClient] = None
+
+
+async def _create_db() -> AsyncClient:
+    # HTTP/2 multiplexes concurrent PostgREST calls over a single TLS
+    # session instead of serializing them per connection, and the pool
+    # limits keep warm connections around for bursts of game traffic.
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=120,
+            max_keepalive_connections=80,
+            keepalive_expiry=60,
+        ),
+    )
+    client = await acreate_client(
+        os.environ["SUPABASE_URL"],
+        os.environ["SUPABASE_KEY"],
+        options=AsyncClientOptions(httpx_client=http_client),
+    )
+    # Cheap health check so a bad URL or key fails loudly at startup instead
+    # of on the first player-facing request.
+    await client.table("games").select("id").limit(1).execute()
+    return client
+
+
+async def get_db() -> AsyncClient:
+    """FastAPI dependency that returns the shared Supabase client."""
+    global _db
+    if _db is None:
+        _db = await _create_db()
+    return _db
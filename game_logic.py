@@ -1,25 +1,69 @@
+import functools
 import random
+import sys
 from typing import List, Tuple, Dict
 
 # Standard 52-card deck
 SUITS = ["H", "D", "C", "S"] # Hearts, Diamonds, Clubs, Spades
 RANKS = ["2", "3", "4", "5", "6", "7", "8", "9", "T", "J", "Q", "K", "A"]
 
-def create_deck() -> List[str]:
-    """Creates a standard 52-card deck."""
-    return [rank + suit for suit in SUITS for rank in RANKS]
+# The card strings never change, so build all 52 once at import time. Decks
+# themselves are handled as compact 0-51 integers; CARD_STRS[card] converts
+# a card back to its string form at the database boundary. The strings are
+# interned: every payload and future hand evaluator shares the same 52
+# objects, so card equality is a pointer comparison.
+CARD_STRS: Tuple[str, ...] = tuple(sys.intern(f"{rank}{suit}") for suit in SUITS for rank in RANKS)
 
-def shuffle_deck(deck: List[str]) -> List[str]:
+# Bind the shuffle function once to skip the module attribute lookup on the
+# per-hand hot path.
+_shuffle = random.shuffle
+
+def create_deck() -> bytearray:
+    """Creates a standard 52-card deck, one byte (0-51) per card."""
+    return bytearray(range(52))
+
+def shuffle_deck(deck: bytearray) -> bytearray:
     """Shuffles the deck."""
-    random.shuffle(deck)
+    _shuffle(deck)
     return deck
 
+@functools.lru_cache(maxsize=1024)
+def _ordered_seats(seats_key: Tuple[Tuple[int, str], ...]) -> Tuple[int, ...]:
+    """
+    Returns the seat numbers of 'playing' players in seat order.
+
+    Callers fetch seats with .order("seat_number") so the database hands the
+    rows over already index-sorted and this is a plain filter. The seat
+    composition of a game is stable across many hands, so the result is
+    cached on the immutable (seat_number, status) key.
+    """
+    return tuple(seat for seat, status in seats_key if status == 'playing')
+
+def _positions_heads_up(
+    player_seats: Tuple[int, ...], dealer_index: int
+) -> Tuple[int, int, int]:
+    """Heads-up blinds: the small blind/dealer acts first pre-flop."""
+    sb_seat = player_seats[dealer_index]
+    return sb_seat, player_seats[1 - dealer_index], sb_seat
+
+def _positions_standard(
+    player_seats: Tuple[int, ...], dealer_index: int
+) -> Tuple[int, int, int]:
+    """Standard blinds for 3+ players: SB, BB, UTG clockwise from the dealer."""
+    n = len(player_seats)
+    d1, d2, d3 = (dealer_index + 1) % n, (dealer_index + 2) % n, (dealer_index + 3) % n
+    return player_seats[d1], player_seats[d2], player_seats[d3]
+
+# Heads-up follows different blind rules, so pick the straight-line helper by
+# player count up front instead of re-branching inside every call.
+_POSITIONS_DISPATCH = {2: _positions_heads_up}
+
 def get_player_positions(
     players: List[Dict], dealer_seat: int
 ) -> Tuple[int, int, int]:
     """
     Determines the seat numbers for the small blind, big blind, and under-the-gun players.
-    
+
     Args:
         players: A list of player dictionaries, each with a 'seat_number'.
         dealer_seat: The seat number of the current dealer.
@@ -27,33 +71,16 @@ def get_player_positions(
     Returns:
         A tuple containing the seat numbers for (small_blind, big_blind, under_the_gun).
     """
-    # Sort players by seat number to create a predictable turn order
-    active_players = sorted([p for p in players if p.get('status') == 'playing'], key=lambda x: x['seat_number'])
-    
-    # Create a circular list of seat numbers for easier wrapping
-    player_seats = [p['seat_number'] for p in active_players]
-    
-    # Find the index of the dealer in the active player list
-    try:
-        dealer_index = player_seats.index(dealer_seat)
-    except ValueError:
-        # If the dealer is not in the active list, start from the first active player
-        dealer_index = 0
-
-    # Handle heads-up (2 players) case separately for blinds
-    if len(player_seats) == 2:
-        sb_seat = player_seats[dealer_index]
-        bb_seat = player_seats[(dealer_index + 1) % len(player_seats)]
-        utg_seat = sb_seat # In heads-up, small blind/dealer acts first pre-flop
-        return sb_seat, bb_seat, utg_seat
-
-    # Standard case for 3+ players
-    sb_index = (dealer_index + 1) % len(player_seats)
-    bb_index = (dealer_index + 2) % len(player_seats)
-    utg_index = (dealer_index + 3) % len(player_seats)
-    
-    sb_seat = player_seats[sb_index]
-    bb_seat = player_seats[bb_index]
-    utg_seat = player_seats[utg_index]
-
-    return sb_seat, bb_seat, utg_seat
+    # Circular, seat-ordered list of active players (cached across hands)
+    seats_key = tuple((p['seat_number'], p.get('status')) for p in players)
+    player_seats = _ordered_seats(seats_key)
+    n = len(player_seats)
+    if n == 0:
+        raise ValueError("No active players to position.")
+
+    # If the dealer is not in the active list, start from the first active
+    # player. A membership test beats try/except since the dealer can
+    # legitimately be absent (e.g. just busted out).
+    dealer_index = player_seats.index(dealer_seat) if dealer_seat in player_seats else 0
+
+    return _POSITIONS_DISPATCH.get(n, _positions_standard)(player_seats, dealer_index)
@@ -1,9 +1,12 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Literal
 from uuid import UUID
 
 # This model represents the structure of the 'settings' JSONB object in the 'games' table.
 class GameSettings(BaseModel):
+    # Reject unknown keys so junk never lands in the settings JSONB.
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
     game_name: str = Field(..., max_length=50)
     buy_in: int = Field(..., gt=0)
     small_blind: int = Field(..., gt=0)
@@ -11,8 +14,11 @@ class GameSettings(BaseModel):
     use_real_chips: bool = False
     max_players: int = Field(..., ge=2, le=8)
 
-# Model for a player submitting an action during a game.
+# Model for a player submitting an action during a game. This is the
+# highest-frequency payload in the app, so keep validation strict and cheap.
 class PlayerAction(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
     action: Literal["fold", "check", "call", "bet", "raise"]
     amount: Optional[int] = Field(None, gt=0)
 
@@ -0,0 +1,37 @@
+-- Deals hole cards and posts blinds for a new hand in a single round trip.
+-- Replaces the N+2 sequential seat/game_state updates the API used to issue
+-- (one per player plus one per blind), and makes the whole hand-start atomic.
+create or replace function deal_and_post_blinds(
+    p_game_id uuid,
+    p_seat_ids uuid[],
+    p_cards_arr text[][],
+    p_sb_id uuid,
+    p_sb_amt int,
+    p_bb_id uuid,
+    p_bb_amt int,
+    p_game_state jsonb
+) returns void
+language plpgsql
+as $$
+begin
+    -- Bulk-write every player's two hole cards in one UPDATE.
+    -- p_cards_arr[i] holds the two cards for the seat at p_seat_ids[i].
+    update seats s
+    set cards = array[p_cards_arr[v.i][1], p_cards_arr[v.i][2]]
+    from generate_subscripts(p_seat_ids, 1) as v(i)
+    where s.id = p_seat_ids[v.i];
+
+    -- Post the blinds.
+    update seats set chip_count = chip_count - p_sb_amt where id = p_sb_id;
+    update seats set chip_count = chip_count - p_bb_amt where id = p_bb_id;
+
+    -- Reset the shared hand state.
+    update game_state
+    set dealer_position = (p_game_state->>'dealer_position')::int,
+        pot_size = (p_game_state->>'pot_size')::int,
+        current_bet = (p_game_state->>'current_bet')::int,
+        community_cards = '{}'::text[],
+        current_player_turn = (p_game_state->>'current_player_turn')::uuid
+    where game_id = p_game_id;
+end;
+$$;
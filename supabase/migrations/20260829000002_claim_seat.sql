@@ -0,0 +1,47 @@
+-- Atomically validates and seats a joining player, replacing the API's
+-- fetch-game / fetch-seats / check / insert sequence (3 round trips and a
+-- race when two players join at once). Locks the game row so concurrent
+-- joins serialize, and reports failures via custom SQLSTATEs that the API
+-- maps back to the HTTP errors it used to raise from Python.
+create or replace function claim_seat(p_game_code text, p_user_id uuid)
+returns int
+language plpgsql
+as $$
+declare
+    v_game_id uuid;
+    v_status text;
+    v_max_players int;
+    v_buy_in int;
+    v_seat int;
+begin
+    select id, status, (settings->>'max_players')::int, (settings->>'buy_in')::int
+    into v_game_id, v_status, v_max_players, v_buy_in
+    from games
+    where game_code = p_game_code
+    for update;
+
+    if v_game_id is null then
+        raise exception 'Game not found.' using errcode = 'PGNF0';
+    end if;
+    if v_status <> 'waiting' then
+        raise exception 'Game is already in progress.' using errcode = 'PGIP0';
+    end if;
+    if exists (select 1 from seats where game_id = v_game_id and user_id = p_user_id) then
+        raise exception 'You are already in this game.' using errcode = 'PGDU0';
+    end if;
+
+    -- Lowest open seat number, or NULL when every seat is taken.
+    select min(s) into v_seat
+    from generate_series(1, v_max_players) s
+    where s not in (select seat_number from seats where game_id = v_game_id);
+
+    if v_seat is null then
+        raise exception 'Game is full.' using errcode = 'PGFU0';
+    end if;
+
+    insert into seats (game_id, user_id, seat_number, chip_count, status)
+    values (v_game_id, p_user_id, v_seat, v_buy_in, 'playing');
+
+    return v_seat;
+end;
+$$;
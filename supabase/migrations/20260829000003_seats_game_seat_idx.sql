@@ -0,0 +1,3 @@
+-- Composite index so per-game seat queries ordered by seat_number come
+-- straight off an index scan instead of sorting.
+create index if not exists seats_game_seat_idx on seats (game_id, seat_number);
@@ -0,0 +1,4 @@
+-- Enforce game-code uniqueness at the database instead of a racy
+-- SELECT-then-INSERT pre-check; the API retries with a fresh code on the
+-- rare unique_violation.
+alter table games add constraint games_code_unique unique (game_code);
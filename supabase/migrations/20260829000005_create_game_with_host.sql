@@ -0,0 +1,27 @@
+-- Creates the games row, its game_state row and the host's seat in one
+-- transaction, replacing three sequential inserts from the API. Also means
+-- a failure partway through can no longer leave a game without state or a
+-- host seat.
+create or replace function create_game_with_host(
+    p_game_code text,
+    p_host_id uuid,
+    p_settings jsonb
+) returns uuid
+language plpgsql
+as $$
+declare
+    v_game_id uuid;
+begin
+    insert into games (game_code, host_id, settings)
+    values (p_game_code, p_host_id, p_settings)
+    returning id into v_game_id;
+
+    insert into game_state (game_id) values (v_game_id);
+
+    -- Host always starts at seat 1.
+    insert into seats (game_id, user_id, seat_number, chip_count, status)
+    values (v_game_id, p_host_id, 1, (p_settings->>'buy_in')::int, 'playing');
+
+    return v_game_id;
+end;
+$$;
@@ -0,0 +1,148 @@
+-- Player actions (fold/check/call/bet/raise) are the hottest write path in
+-- the app. apply_action performs the whole read-modify-write cycle --
+-- validate turn, validate legality, move chips, advance the turn -- in one
+-- locked transaction, so the API needs a single round trip per action and
+-- two concurrent actions can never interleave.
+
+-- How much the seat has put in during the current betting round; needed to
+-- tell a legal check from an illegal one and to price calls.
+alter table seats add column if not exists round_bet int not null default 0;
+
+-- Recreate deal_and_post_blinds so it maintains round_bet: zero for the
+-- dealt hands, the posted amounts for the blinds.
+create or replace function deal_and_post_blinds(
+    p_game_id uuid,
+    p_seat_ids uuid[],
+    p_cards_arr text[][],
+    p_sb_id uuid,
+    p_sb_amt int,
+    p_bb_id uuid,
+    p_bb_amt int,
+    p_game_state jsonb
+) returns void
+language plpgsql
+as $$
+begin
+    -- Bulk-write every player's two hole cards in one UPDATE.
+    -- p_cards_arr[i] holds the two cards for the seat at p_seat_ids[i].
+    update seats s
+    set cards = array[p_cards_arr[v.i][1], p_cards_arr[v.i][2]],
+        round_bet = 0
+    from generate_subscripts(p_seat_ids, 1) as v(i)
+    where s.id = p_seat_ids[v.i];
+
+    -- Post the blinds.
+    update seats set chip_count = chip_count - p_sb_amt, round_bet = p_sb_amt where id = p_sb_id;
+    update seats set chip_count = chip_count - p_bb_amt, round_bet = p_bb_amt where id = p_bb_id;
+
+    -- Reset the shared hand state.
+    update game_state
+    set dealer_position = (p_game_state->>'dealer_position')::int,
+        pot_size = (p_game_state->>'pot_size')::int,
+        current_bet = (p_game_state->>'current_bet')::int,
+        community_cards = '{}'::text[],
+        current_player_turn = (p_game_state->>'current_player_turn')::uuid
+    where game_id = p_game_id;
+end;
+$$;
+
+-- For bet/raise, p_amount is the total the player raises their round bet to
+-- (not the increment). Failures are reported with custom SQLSTATEs that the
+-- API maps back to HTTP errors, mirroring claim_seat.
+create or replace function apply_action(
+    p_game_code text,
+    p_user_id uuid,
+    p_action text,
+    p_amount int
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_game_id uuid;
+    v_state game_state%rowtype;
+    v_seat seats%rowtype;
+    v_to_call int;
+    v_next uuid;
+begin
+    select id into v_game_id from games where game_code = p_game_code;
+    if v_game_id is null then
+        raise exception 'Game not found.' using errcode = 'PGNF0';
+    end if;
+
+    -- Lock the hand state; concurrent actions on the same game serialize here.
+    select * into v_state from game_state where game_id = v_game_id for update;
+
+    if v_state.current_player_turn is distinct from p_user_id then
+        raise exception 'It is not your turn.' using errcode = 'PGNT0';
+    end if;
+
+    select * into v_seat
+    from seats
+    where game_id = v_game_id and user_id = p_user_id
+    for update;
+    if v_seat.status <> 'playing' then
+        raise exception 'You cannot act in this hand.' using errcode = 'PGNA0';
+    end if;
+
+    v_to_call := v_state.current_bet - v_seat.round_bet;
+
+    if p_action = 'fold' then
+        update seats set status = 'folded' where id = v_seat.id;
+
+    elsif p_action = 'check' then
+        if v_to_call > 0 then
+            raise exception 'Cannot check while facing a bet.' using errcode = 'PGIL0';
+        end if;
+
+    elsif p_action = 'call' then
+        if v_to_call <= 0 then
+            raise exception 'There is no bet to call.' using errcode = 'PGIL0';
+        end if;
+        v_to_call := least(v_to_call, v_seat.chip_count);
+        update seats
+        set chip_count = chip_count - v_to_call,
+            round_bet = round_bet + v_to_call,
+            status = case when chip_count = v_to_call then 'all_in' else status end
+        where id = v_seat.id;
+        v_state.pot_size := v_state.pot_size + v_to_call;
+
+    elsif p_action in ('bet', 'raise') then
+        if p_amount is null or p_amount <= v_state.current_bet then
+            raise exception 'Bet must exceed the current bet.' using errcode = 'PGIL0';
+        end if;
+        if p_amount - v_seat.round_bet > v_seat.chip_count then
+            raise exception 'Not enough chips.' using errcode = 'PGIL0';
+        end if;
+        update seats
+        set chip_count = chip_count - (p_amount - round_bet),
+            round_bet = p_amount,
+            status = case when chip_count = p_amount - round_bet then 'all_in' else status end
+        where id = v_seat.id;
+        v_state.pot_size := v_state.pot_size + (p_amount - v_seat.round_bet);
+        v_state.current_bet := p_amount;
+
+    else
+        raise exception 'Unknown action.' using errcode = 'PGIL0';
+    end if;
+
+    -- Next to act: the nearest still-playing seat clockwise from the actor.
+    -- (seat_number <= actor) sorts the higher seats first, giving wrap-around.
+    select user_id into v_next
+    from seats
+    where game_id = v_game_id and status = 'playing' and user_id <> p_user_id
+    order by (seat_number <= v_seat.seat_number), seat_number
+    limit 1;
+
+    update game_state
+    set pot_size = v_state.pot_size,
+        current_bet = v_state.current_bet,
+        current_player_turn = v_next
+    where game_id = v_game_id;
+
+    return jsonb_build_object(
+        'pot_size', v_state.pot_size,
+        'current_bet', v_state.current_bet,
+        'current_player_turn', v_next
+    );
+end;
+$$;